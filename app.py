@@ -0,0 +1,1371 @@
+"""
+ClipForge Backend API
+Handles: VOD audio extraction → Transcription → AI Clip Detection
+Deploy to Railway, Render, or Replit
+"""
+
+import os
+import time
+import json
+import math
+import re
+import hmac
+import hashlib
+import queue
+import threading
+import uuid
+import tempfile
+import redis
+import requests
+import yt_dlp
+from celery import Celery
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, request, jsonify
+from flask_cors import CORS
+
+app = Flask(__name__)
+CORS(app)
+
+# --- Configuration ---
+ASSEMBLYAI_API_KEY = os.environ.get("ASSEMBLYAI_API_KEY", "YOUR_ASSEMBLYAI_KEY")
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "YOUR_OPENAI_KEY")
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+# Public base URL of this service, used to build the AssemblyAI webhook URL
+PUBLIC_URL = os.environ.get("PUBLIC_URL", "").rstrip("/")
+# Shared secret AssemblyAI echoes back in WEBHOOK_AUTH_HEADER on every callback
+WEBHOOK_SECRET = os.environ.get("ASSEMBLYAI_WEBHOOK_SECRET", "")
+WEBHOOK_AUTH_HEADER = "X-ClipForge-Webhook-Secret"
+JOB_TTL = 7 * 24 * 60 * 60  # Keep job results for 7 days
+RESULT_CACHE_TTL = 24 * 60 * 60  # Reuse finished results for the same VOD for 1 day
+AUDIO_URL_CACHE_TTL = 30 * 60  # Reuse extracted audio URLs for 30 min (below signed-URL expiry)
+BATCH_POLL_INTERVAL = 2 * 60  # Check OpenAI batches every 2 minutes
+BATCH_TRANSCRIBE_DEADLINE = 6 * 60 * 60  # Submit a batch after 6h even if some VODs never finished
+JOB_STALE_AFTER = 3 * 60 * 60  # Give up on a single-VOD job still pending after 3h (lost webhook or worker)
+MAX_NUM_CLIPS = 20  # Upper bound on num_clips, which scales OpenAI output tokens
+MAX_BATCH_VODS = 50  # Upper bound on VODs per /api/extract-clips-batch request
+
+redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+
+# Background workers run the pipeline so HTTP requests return immediately.
+# Start them with: celery -A app.celery worker -c 8
+# No result backend: task state lives in the clipforge:task/job keys instead.
+celery = Celery("clipforge", broker=REDIS_URL)
+
+# (connect, read) seconds; requests has no default and would wait forever on a hung API
+HTTP_TIMEOUT = (10, 120)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies HTTP_TIMEOUT to requests made without an explicit timeout."""
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = HTTP_TIMEOUT
+        return super().send(request, **kwargs)
+
+
+# Shared HTTP session for AssemblyAI and OpenAI: keeps TLS connections alive
+# across calls and retries transient failures. urllib3 only retries POSTs on
+# connection errors, never on a status code, so submissions aren't duplicated.
+http_session = requests.Session()
+http_session.mount("https://", TimeoutHTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+
+# =============================================
+# JOB STATE (shared across workers via Redis)
+# =============================================
+def save_job(transcript_id, job):
+    """Persist the state of a clip extraction job, keyed by transcript ID."""
+    redis_client.setex(f"clipforge:job:{transcript_id}", JOB_TTL, json.dumps(job))
+
+
+def load_job(transcript_id):
+    """Return the stored job for a transcript ID, or None if unknown/expired."""
+    raw = redis_client.get(f"clipforge:job:{transcript_id}")
+    return json.loads(raw) if raw else None
+
+
+def create_job(transcript_id, job):
+    """
+    Store a new job unless one already exists for this transcript ID.
+    The submitting task and the webhook can race to create the same job;
+    whichever loses must not overwrite progress the other already made.
+    """
+    redis_client.set(f"clipforge:job:{transcript_id}", json.dumps(job), ex=JOB_TTL, nx=True)
+
+
+def claim_job_callback(transcript_id):
+    """
+    Atomically claim a finished transcript for the next pipeline step, so
+    duplicate webhook deliveries only act once. Returns True for the first caller.
+    """
+    return bool(redis_client.set(f"clipforge:job:{transcript_id}:claimed", 1, ex=JOB_TTL, nx=True))
+
+
+def release_job_callback(transcript_id):
+    """Undo claim_job_callback when the next step couldn't be queued, so a redelivery can retry."""
+    redis_client.delete(f"clipforge:job:{transcript_id}:claimed")
+
+
+def is_stale(record):
+    """True if a task or job has been pending for longer than JOB_STALE_AFTER."""
+    created_at = record.get("created_at")
+    return record["status"] == "pending" and created_at is not None and time.time() - created_at > JOB_STALE_AFTER
+
+
+def expire_stale_job(transcript_id, job):
+    """
+    Mark a single-VOD job that has been pending too long as failed, e.g. its
+    webhook never arrived or its worker died. Batch jobs are left alone: they
+    legitimately wait on the batch deadline and the OpenAI Batch API.
+    """
+    if not job.get("batch_id") and is_stale(job):
+        job.update({"status": "error", "message": "Clip extraction timed out; please retry."})
+        save_job(transcript_id, job)
+    return job
+
+
+def save_submission(job_id, job):
+    """
+    Persist a job before it is submitted to AssemblyAI, keyed by our own job ID.
+    The webhook URL carries this ID, so a callback that beats the transcript
+    ID back to us can still find the job.
+    """
+    redis_client.setex(f"clipforge:submission:{job_id}", JOB_TTL, json.dumps(job))
+
+
+def load_submission(job_id):
+    """Return the pre-submission record for a job ID, or None if unknown/expired."""
+    raw = redis_client.get(f"clipforge:submission:{job_id}")
+    return json.loads(raw) if raw else None
+
+
+def save_task(task_id, task):
+    """
+    Persist the state of a /api/extract-clips task for JOB_TTL. Celery keeps
+    no results, so this is what /api/task reads.
+    """
+    redis_client.setex(f"clipforge:task:{task_id}", JOB_TTL, json.dumps(task))
+
+
+def load_task(task_id):
+    """Return the stored task, or None if unknown/expired."""
+    raw = redis_client.get(f"clipforge:task:{task_id}")
+    return json.loads(raw) if raw else None
+
+
+def save_batch(batch_id, batch):
+    """Persist a batch of VODs submitted to /api/extract-clips-batch."""
+    redis_client.setex(f"clipforge:batch:{batch_id}", JOB_TTL, json.dumps(batch))
+
+
+def load_batch(batch_id):
+    """Return the stored batch, or None if unknown/expired."""
+    raw = redis_client.get(f"clipforge:batch:{batch_id}")
+    return json.loads(raw) if raw else None
+
+
+def batch_transcript_ids(batch_id):
+    """Transcript IDs of every VOD in a batch that was submitted to AssemblyAI."""
+    return redis_client.smembers(f"clipforge:batch:{batch_id}:transcripts")
+
+
+def add_batch_transcript(batch_id, transcript_id):
+    """Remember that a VOD of the batch was submitted as transcript_id."""
+    key = f"clipforge:batch:{batch_id}:transcripts"
+    redis_client.sadd(key, transcript_id)
+    redis_client.expire(key, JOB_TTL)
+
+
+def add_batch_failure(batch_id, vod_url, message):
+    """Record a VOD that could not be submitted for transcription."""
+    key = f"clipforge:batch:{batch_id}:failed"
+    redis_client.rpush(key, json.dumps({"vod_url": vod_url, "message": message}))
+    redis_client.expire(key, JOB_TTL)
+
+
+def batch_failures(batch_id):
+    """VODs of a batch that failed before transcription, with their error."""
+    return [json.loads(raw) for raw in redis_client.lrange(f"clipforge:batch:{batch_id}:failed", 0, -1)]
+
+
+def batch_done_members(batch_id):
+    """Transcript IDs (or failure markers) of every VOD in a batch that is done."""
+    return redis_client.smembers(f"clipforge:batch:{batch_id}:done")
+
+
+def mark_batch_vod_done(batch_id, member):
+    """
+    Mark one VOD of a batch as transcribed (member is its transcript ID) or
+    failed (a unique failure marker). Once every VOD is done, queue the
+    OpenAI batch for the whole lot.
+    """
+    # A set rather than a counter, so a duplicate webhook can't count twice
+    key = f"clipforge:batch:{batch_id}:done"
+    redis_client.sadd(key, member)
+    redis_client.expire(key, JOB_TTL)
+
+    batch = load_batch(batch_id)
+    if batch and redis_client.scard(key) >= len(batch["vods"]):
+        submit_clip_batch_task.delay(batch_id)
+
+
+def claim_batch_submission(batch_id):
+    """
+    Atomically claim the right to submit a batch to OpenAI. Both the last
+    webhook and the deadline check may try; returns True for the first caller.
+    """
+    return bool(redis_client.set(f"clipforge:batch:{batch_id}:submitted", 1, ex=JOB_TTL, nx=True))
+
+
+def fail_batch(batch_id, message):
+    """Mark a batch and every job still pending in it as failed."""
+    for transcript_id in batch_transcript_ids(batch_id):
+        job = load_job(transcript_id)
+        if job and job["status"] == "pending":
+            job.update({"status": "error", "message": message})
+            save_job(transcript_id, job)
+
+    batch = load_batch(batch_id) or {"batch_id": batch_id}
+    batch.update({"status": "error", "message": message})
+    save_batch(batch_id, batch)
+
+
+def parse_num_clips(value):
+    """
+    Coerce num_clips from a request body to an int (Bubble often sends
+    numbers as strings). Returns None unless it is a whole number between
+    1 and MAX_NUM_CLIPS.
+    """
+    # bool is an int subclass, and int() would silently truncate 2.5
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        return None
+    try:
+        num_clips = int(value)
+    except (TypeError, ValueError):
+        return None
+    return num_clips if 1 <= num_clips <= MAX_NUM_CLIPS else None
+
+
+def parse_flag(value):
+    """
+    Coerce an optional boolean from a request body (Bubble may send "true"
+    or 1). Returns True/False, or None if the value isn't recognisably boolean.
+    """
+    if value in (None, False, 0, "false", "0", ""):
+        return False
+    if value in (True, 1, "true", "1"):
+        return True
+    return None
+
+
+def result_cache_key(vod_url, num_clips):
+    """Cache key for a finished pipeline result of (vod_url, num_clips)."""
+    vod_hash = hashlib.sha256(vod_url.encode()).hexdigest()
+    return f"clipforge:{vod_hash}:{num_clips}"
+
+
+def load_cached_result(vod_url, num_clips):
+    """Return a previously computed result for this VOD, or None."""
+    raw = redis_client.get(result_cache_key(vod_url, num_clips))
+    return json.loads(raw) if raw else None
+
+
+def cache_result(job):
+    """Store a successful job so repeat requests skip the whole pipeline."""
+    redis_client.setex(
+        result_cache_key(job["vod_url"], job["num_clips"]),
+        RESULT_CACHE_TTL,
+        json.dumps(job),
+    )
+
+
+# =============================================
+# STEP 1: Extract direct audio URL from VOD
+# =============================================
+YDL_OPTS = {
+    "format": "bestaudio/best",
+    "quiet": True,
+    "no_warnings": True,
+    "extract_flat": False,
+    "skip_download": True,
+}
+
+# Creating a YoutubeDL loads every extractor (~1s), so instances are kept and
+# reused across requests. A YoutubeDL is not safe to share between concurrent
+# requests, so each one checks an instance out of this pool and returns it.
+# At most YDL_POOL_SIZE instances exist per process; further requests wait.
+YDL_POOL_SIZE = 4
+ydl_pool = queue.SimpleQueue()
+ydl_slots = threading.BoundedSemaphore(YDL_POOL_SIZE)
+
+
+@contextmanager
+def pooled_youtube_dl():
+    """Borrow a YoutubeDL from the pool, waiting if all YDL_POOL_SIZE are in use."""
+    with ydl_slots:
+        try:
+            ydl = ydl_pool.get_nowait()
+        except queue.Empty:
+            ydl = yt_dlp.YoutubeDL(YDL_OPTS)
+
+        try:
+            yield ydl
+        except yt_dlp.utils.DownloadError:
+            # An unsupported or broken link; the instance itself is fine
+            ydl_pool.put(ydl)
+            raise
+        except BaseException:
+            # Anything else may have left the instance in a bad state
+            ydl.close()
+            raise
+        else:
+            ydl_pool.put(ydl)
+
+
+def extract_audio_url(vod_url):
+    """
+    Returns the direct audio URL for a VOD, cached in Redis for
+    AUDIO_URL_CACHE_TTL so retries and the other endpoints skip yt-dlp.
+    """
+    cache_key = f"clipforge:audio-url:{hashlib.sha256(vod_url.encode()).hexdigest()}"
+    audio_url = redis_client.get(cache_key)
+    if audio_url:
+        return audio_url
+
+    audio_url = resolve_audio_url(vod_url)
+    redis_client.setex(cache_key, AUDIO_URL_CACHE_TTL, audio_url)
+    return audio_url
+
+
+def resolve_audio_url(vod_url):
+    """
+    Uses yt-dlp to get a direct audio URL from Twitch/Kick/YouTube VODs.
+    Returns the direct URL without downloading the file.
+    """
+    with pooled_youtube_dl() as ydl:
+        info = ydl.extract_info(vod_url, download=False)
+        # Get the best audio format URL
+        if "formats" in info:
+            # Prefer audio-only formats
+            audio_formats = [f for f in info["formats"] if f.get("acodec") != "none" and f.get("vcodec") in ("none", None)]
+            if audio_formats:
+                return audio_formats[-1]["url"]
+            # Fallback: use best format with audio
+            for fmt in reversed(info["formats"]):
+                if fmt.get("acodec") != "none" and fmt.get("url"):
+                    return fmt["url"]
+        # Fallback to direct URL
+        if "url" in info:
+            return info["url"]
+
+    raise Exception("Could not extract audio URL from the provided VOD link.")
+
+
+# =============================================
+# STEP 2: Transcribe audio with AssemblyAI
+# =============================================
+def submit_transcription(audio_url, webhook_url=None):
+    """
+    Submit audio URL to AssemblyAI for transcription.
+    If webhook_url is given, AssemblyAI POSTs to it once the transcript is done.
+    """
+    headers = {
+        "Authorization": ASSEMBLYAI_API_KEY,
+        "Content-Type": "application/json",
+    }
+    payload = {
+        "audio_url": audio_url,
+        "speech_models": ["universal-2"],
+    }
+    if webhook_url:
+        payload["webhook_url"] = webhook_url
+        payload["webhook_auth_header_name"] = WEBHOOK_AUTH_HEADER
+        payload["webhook_auth_header_value"] = WEBHOOK_SECRET
+    response = http_session.post(
+        "https://api.assemblyai.com/v2/transcript",
+        headers=headers,
+        json=payload,
+    )
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+def get_transcript(transcript_id, etag=None):
+    """
+    Fetch the current state of a transcript from AssemblyAI.
+    Returns (data, etag). With etag, sends If-None-Match and returns
+    (None, etag) if the transcript hasn't changed (304 Not Modified).
+    """
+    headers = {"Authorization": ASSEMBLYAI_API_KEY}
+    if etag:
+        headers["If-None-Match"] = etag
+    response = http_session.get(
+        f"https://api.assemblyai.com/v2/transcript/{transcript_id}",
+        headers=headers,
+    )
+
+    # Unchanged since the last fetch: skip downloading and parsing the body
+    if response.status_code == 304:
+        response.close()
+        return None, etag
+
+    response.raise_for_status()
+    return response.json(), response.headers.get("ETag") or etag
+
+
+def fetch_finished_transcript(transcript_id):
+    """
+    Fetch a transcript AssemblyAI reported as done.
+    Returns (text, words); raises if it failed or came back empty.
+    """
+    transcript_data, _ = get_transcript(transcript_id)
+    if transcript_data["status"] == "error":
+        raise Exception(f"Transcription failed: {transcript_data.get('error', 'Unknown error')}")
+
+    transcript_text = transcript_data.get("text", "")
+    words = transcript_data.get("words", [])
+
+    if not transcript_text or not words:
+        raise Exception("Transcription returned empty. The VOD may not have clear audio.")
+
+    return transcript_text, words
+
+
+def poll_transcription(transcript_id, timeout=600):
+    """
+    Poll AssemblyAI until transcription is complete (max 10 min).
+    Only used by the synchronous /api/transcribe endpoint; clip extraction
+    is driven by the AssemblyAI webhook instead.
+    """
+    start_time = time.time()
+    attempt = 0
+    etag = None
+
+    while time.time() - start_time < timeout:
+        # Revalidates against the last version seen, if AssemblyAI sent an ETag
+        data, etag = get_transcript(transcript_id, etag=etag)
+
+        if data is not None:
+            if data["status"] == "completed":
+                return data
+            elif data["status"] == "error":
+                raise Exception(f"Transcription failed: {data.get('error', 'Unknown error')}")
+
+        # Exponential backoff: 1s, 1.5s, 2.25s, ... capped at 15s
+        time.sleep(min(15, 1.0 * 1.5 ** attempt))
+        attempt += 1
+
+    raise Exception("Transcription timed out after 10 minutes.")
+
+
+# =============================================
+# STEP 3: Use OpenAI to identify best clips
+# =============================================
+
+# Static instructions go in the system message so every request shares the
+# exact same prefix and OpenAI can serve it from its prompt cache. Prompt
+# caching only kicks in for prefixes of 1024+ tokens, hence the examples.
+# Anything that varies per request (num_clips, transcript) goes in the user
+# message, after this block.
+CLIP_SYSTEM_PROMPT = """You are an expert at identifying viral, entertaining, and highlight-worthy moments from live stream transcripts. You work for a clipping service that turns long Twitch, Kick and YouTube VODs into short vertical clips for TikTok, YouTube Shorts, Instagram Reels and Twitter.
+
+The user message tells you how many clips to find, followed by the TIMESTAMPED TRANSCRIPT of a stream VOD. The transcript is a JSON array of sections, each with:
+- "start_ms": when the section starts, in milliseconds from the start of the VOD
+- "end_ms": when the section ends, in milliseconds from the start of the VOD
+- "text": what was said during the section
+
+HOW TO PICK CLIPS
+- Choose moments that would go viral on TikTok, YouTube Shorts, or Twitter
+- Look for: funny moments, epic plays, emotional reactions, controversial takes, clutch moments, rage/excitement, plot twists
+- Prefer moments with a clear setup and payoff that make sense without having watched the rest of the stream
+- Prefer strong spoken reactions: shouting, laughing, disbelief, trash talk, quotable one-liners
+- Chat interactions, donations and subscriber reactions are good when the streamer reacts to them in an entertaining way
+- Skip dead air, menu navigation, ad reads, "be right back" segments, technical setup and long stretches of routine gameplay commentary
+- Never return two clips that overlap in time; if two candidates overlap, keep the stronger one
+- Spread clips across the VOD when quality is similar, rather than clustering them all in one section
+
+TIMESTAMP RULES
+- Each clip should be 15-60 seconds long (end_ms - start_ms between 15000 and 60000)
+- Use the timestamps (in milliseconds) from the sections; never invent timestamps outside the transcript
+- Start a few seconds before the key moment so viewers get the setup, and end shortly after the payoff
+- A clip may span several consecutive sections
+
+SCORING
+- "virality_score" is an integer from 1 to 10
+- 9-10: instantly shareable, likely to be reposted or meme'd (huge clutch, hilarious fail, iconic quote)
+- 7-8: very entertaining, strong reaction or highlight that stands on its own
+- 5-6: solid moment but needs some context or has a weaker payoff
+- 1-4: only use when nothing better exists in the transcript
+
+TITLES
+- Catchy, specific and under 60 characters
+- Describe what happens, not the streamer's name; no hashtags, no emojis, no clickbait in all caps
+- Good: "He Tried To Bait The Whole Lobby", "Chat Predicted This Perfectly", "1HP Clutch To Win The Tournament"
+- Bad: "Funny Moment", "Clip 3", "INSANE!!!! MUST WATCH"
+
+OUTPUT FORMAT
+Return a JSON object with a "clips" array holding exactly the requested number of objects, each containing:
+- "title": catchy clip title (max 60 chars)
+- "start_ms": start timestamp in milliseconds
+- "end_ms": end timestamp in milliseconds
+- "virality_score": 1-10 rating
+- "reason": brief reason why this moment is clip-worthy
+
+Sort by virality_score descending. Return ONLY the JSON object, no other text.
+
+EXAMPLE 1
+Transcript excerpt:
+[{"start_ms": 732000, "end_ms": 751000, "text": "okay okay one v four I have like no health no no no wait he's reloading he's reloading"}, {"start_ms": 751000, "end_ms": 769000, "text": "one two three FOUR LET'S GO chat did you see that did anyone clip that oh my god my hands are shaking"}]
+Output:
+{"clips": [{"title": "1v4 Clutch With No Health Left", "start_ms": 735000, "end_ms": 768000, "virality_score": 9, "reason": "Tense low-health 1v4 with an explosive celebration at the end"}]}
+
+EXAMPLE 2
+Transcript excerpt:
+[{"start_ms": 2415000, "end_ms": 2433000, "text": "someone in chat says I can't cook I literally went to culinary school watch this"}, {"start_ms": 2433000, "end_ms": 2452000, "text": "wait why is it on fire why is it on fire is that normal chat is that normal somebody get the extinguisher"}]
+Output:
+{"clips": [{"title": "Culinary School Grad Sets Pan On Fire", "start_ms": 2416000, "end_ms": 2450000, "virality_score": 8, "reason": "Confident boast immediately followed by a kitchen disaster"}]}
+
+EXAMPLE 3
+Transcript excerpt:
+[{"start_ms": 5120000, "end_ms": 5139000, "text": "honestly this patch ruined the game and I'm not even mad I'm just disappointed like who tested this"}, {"start_ms": 5139000, "end_ms": 5161000, "text": "the devs said they play their own game there is no way they play their own game there is no way"}]
+Output:
+{"clips": [{"title": "Streamer Roasts The New Patch", "start_ms": 5121000, "end_ms": 5158000, "virality_score": 6, "reason": "Quotable rant about a controversial balance patch"}]}
+
+These examples show the format only; always use the timestamps and content of the transcript you are given."""
+CLIP_PROMPT_CACHE_KEY = hashlib.md5(CLIP_SYSTEM_PROMPT.encode()).hexdigest()
+
+# Structured output schema, so OpenAI always returns parseable JSON.
+# Strict mode requires an object at the root, hence the "clips" wrapper.
+CLIP_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "clips",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "clips": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "title": {"type": "string"},
+                            "start_ms": {"type": "integer"},
+                            "end_ms": {"type": "integer"},
+                            "virality_score": {"type": "integer"},
+                            "reason": {"type": "string"},
+                        },
+                        "required": ["title", "start_ms", "end_ms", "virality_score", "reason"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["clips"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Markdown code fence around a model reply, e.g. ```json ... ```
+FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+
+# Long transcripts are split into windows of roughly this many tokens and
+# analyzed in parallel, so each request stays well inside the context window.
+CHUNK_TOKEN_BUDGET = 8000
+MAX_PARALLEL_CLIP_REQUESTS = 8
+
+# A clip object is ~80 output tokens; cap generation near the real reply size
+CLIP_MAX_TOKENS_PER_CLIP = 150
+CLIP_MAX_TOKENS_OVERHEAD = 100
+
+def identify_clips(transcript_text, words_with_timestamps, num_clips=5):
+    """
+    Send the transcript to OpenAI to identify the most viral moments.
+    Uses word-level timestamps for precise clip boundaries.
+    """
+    # Step 3a: Split long transcripts into windows and analyze them in parallel
+    clip_requests = plan_clip_requests(words_with_timestamps, num_clips)
+    if len(clip_requests) == 1:
+        return request_clip_candidates(*clip_requests[0])
+
+    print(f"[4/4] Transcript split into {len(clip_requests)} windows, {clip_requests[0][1]} candidates each")
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_CLIP_REQUESTS) as executor:
+        results = list(executor.map(try_request_clip_candidates, clip_requests))
+
+    # One failed window only loses its share of candidates, not the whole VOD
+    if all(chunk_clips is None for chunk_clips in results):
+        raise Exception("Clip detection failed for every transcript window.")
+    candidates = [clip for chunk_clips in results if chunk_clips for clip in chunk_clips]
+
+    # Step 3b: Merge and rerank across windows
+    return merge_clips(candidates, num_clips)
+
+
+def try_request_clip_candidates(clip_request):
+    """request_clip_candidates for one (sections, num_clips) window; None if it failed."""
+    try:
+        return request_clip_candidates(*clip_request)
+    except Exception as e:
+        print(f"Error: clip request for one window failed: {str(e)}")
+        return None
+
+
+def build_sections(words_with_timestamps):
+    """
+    Build a timestamped transcript for better accuracy. Sections are 50 words,
+    growing for long VODs so there are never more than ~400 of them and the
+    per-section JSON overhead stays bounded.
+    """
+    # Joining each slice once keeps this linear in the number of words.
+    words = words_with_timestamps
+    section_size = max(50, len(words) // 400)
+    return [
+        {
+            "start_ms": words[i]["start"],
+            "end_ms": words[min(i + section_size - 1, len(words) - 1)]["end"],
+            "text": " ".join(word["text"] for word in words[i:i + section_size]),
+        }
+        for i in range(0, len(words), section_size)
+    ]
+
+
+def plan_clip_requests(words_with_timestamps, num_clips):
+    """
+    Split the transcript into windows and decide how many clips to ask each
+    window for. Returns a list of (sections, num_clips) pairs, one per request.
+    """
+    chunks = split_sections(build_sections(words_with_timestamps))
+    if len(chunks) == 1:
+        return [(chunks[0], num_clips)]
+
+    # Ask each window for a share of the clips, with headroom for reranking
+    per_chunk = max(1, math.ceil(num_clips * 1.5 / len(chunks)))
+    return [(chunk, per_chunk) for chunk in chunks]
+
+
+def parse_llm_json(content):
+    """
+    Parse a JSON reply from OpenAI. Structured outputs already return bare
+    JSON; stripping a stray markdown fence is only a fallback.
+    """
+    return json.loads(FENCE_RE.sub("", content).strip())
+
+
+def estimate_tokens(section):
+    """Rough token count of a section as sent to OpenAI (~4 chars per token)."""
+    return len(json.dumps(section, separators=(",", ":"))) // 4
+
+
+def split_sections(sections, token_budget=CHUNK_TOKEN_BUDGET):
+    """
+    Partition sections into windows of about token_budget tokens.
+    Consecutive windows share one section so moments on a boundary are not lost.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for section in sections:
+        tokens = estimate_tokens(section)
+        if current and current_tokens + tokens > token_budget:
+            chunks.append(current)
+            # Carry the last section over as overlap
+            current = [current[-1]]
+            current_tokens = estimate_tokens(current[0])
+        current.append(section)
+        current_tokens += tokens
+
+    if current:
+        chunks.append(current)
+    return chunks or [[]]
+
+
+def merge_clips(clips, num_clips):
+    """
+    Rank clips from all windows by virality_score, drop clips that overlap a
+    higher-scoring one (the same moment seen from two windows), keep the top num_clips.
+    """
+    ranked = sorted(clips, key=lambda clip: clip.get("virality_score", 0), reverse=True)
+    merged = []
+
+    for clip in ranked:
+        overlaps = any(
+            clip["start_ms"] < kept["end_ms"] and kept["start_ms"] < clip["end_ms"]
+            for kept in merged
+        )
+        if not overlaps:
+            merged.append(clip)
+        if len(merged) == num_clips:
+            break
+
+    return merged
+
+
+def clip_request_body(sections, num_clips):
+    """Chat completion request asking for the num_clips best moments in a window."""
+    # Compact separators: indentation whitespace is billed as input tokens
+    sections_text = json.dumps(sections, separators=(",", ":"))
+
+    # Only the variable parts go in the user message, after the cached prefix
+    prompt = f"""Identify the top {num_clips} most clip-worthy moments. Return exactly {num_clips} objects.
+
+TIMESTAMPED TRANSCRIPT:
+{sections_text}"""
+
+    payload = {
+        "model": "gpt-4.1-mini",
+        "messages": [
+            {"role": "system", "content": CLIP_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7,
+        "max_tokens": CLIP_MAX_TOKENS_OVERHEAD + CLIP_MAX_TOKENS_PER_CLIP * num_clips,
+        "prompt_cache_key": CLIP_PROMPT_CACHE_KEY,
+        "response_format": CLIP_RESPONSE_FORMAT,
+    }
+    return payload
+
+
+def request_clip_candidates(sections, num_clips):
+    """Ask OpenAI for the num_clips best moments within one window of sections."""
+    headers = {
+        "Authorization": f"Bearer {OPENAI_API_KEY}",
+        "Content-Type": "application/json",
+    }
+
+    response = http_session.post(
+        "https://api.openai.com/v1/chat/completions",
+        headers=headers,
+        json=clip_request_body(sections, num_clips),
+    )
+    response.raise_for_status()
+
+    content = response.json()["choices"][0]["message"]["content"]
+    clips = parse_llm_json(content)["clips"]
+    return clips
+
+
+# =============================================
+# STEP 3 (BATCH): OpenAI Batch API, 50% cheaper
+# =============================================
+def create_clip_batch(rows):
+    """
+    Upload batch rows as JSONL and start an OpenAI batch over them.
+    Each row is {"custom_id": ..., "body": <chat completion request>}.
+    Returns the OpenAI batch ID.
+    """
+    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
+    jsonl = "\n".join(
+        json.dumps({
+            "custom_id": row["custom_id"],
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": row["body"],
+        })
+        for row in rows
+    )
+
+    response = http_session.post(
+        "https://api.openai.com/v1/files",
+        headers=headers,
+        data={"purpose": "batch"},
+        files={"file": ("batch.jsonl", jsonl.encode())},
+    )
+    response.raise_for_status()
+    input_file_id = response.json()["id"]
+
+    response = http_session.post(
+        "https://api.openai.com/v1/batches",
+        headers=headers,
+        json={
+            "input_file_id": input_file_id,
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h",
+        },
+    )
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+def get_clip_batch(openai_batch_id):
+    """Fetch the current state of an OpenAI batch."""
+    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
+    response = http_session.get(
+        f"https://api.openai.com/v1/batches/{openai_batch_id}",
+        headers=headers,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def download_batch_output(file_id):
+    """Download a batch output file and return its rows."""
+    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
+    response = http_session.get(
+        f"https://api.openai.com/v1/files/{file_id}/content",
+        headers=headers,
+    )
+    response.raise_for_status()
+    return [json.loads(line) for line in response.text.splitlines() if line.strip()]
+
+
+# =============================================
+# BACKGROUND TASKS (Celery)
+# =============================================
+def start_transcription(vod_url, num_clips, task_id=None, batch_id=None):
+    """
+    Steps 1-2: extract the audio URL and submit it to AssemblyAI with a webhook.
+    Returns the transcript ID; the webhook picks the job up from there.
+    """
+    # Step 1: Extract audio URL
+    print(f"[1/4] Extracting audio from: {vod_url}")
+    audio_url = extract_audio_url(vod_url)
+    print(f"[1/4] Audio URL extracted successfully")
+
+    # Save the job before submitting, in case the webhook arrives first
+    job_id = uuid.uuid4().hex
+    job = {
+        "status": "pending",
+        "job_id": job_id,
+        "task_id": task_id,
+        "batch_id": batch_id,
+        "vod_url": vod_url,
+        "num_clips": num_clips,
+        "audio_url": audio_url,
+        "created_at": time.time(),
+    }
+    save_submission(job_id, job)
+
+    # Step 2: Submit for transcription, AssemblyAI calls us back when done
+    print(f"[2/4] Submitting to AssemblyAI...")
+    transcript_id = submit_transcription(
+        audio_url, webhook_url=f"{PUBLIC_URL}/api/assemblyai-callback?job_id={job_id}"
+    )
+    print(f"[2/4] Transcript ID: {transcript_id}")
+
+    if batch_id:
+        add_batch_transcript(batch_id, transcript_id)
+    create_job(transcript_id, {**job, "transcript_id": transcript_id})
+    return transcript_id
+
+
+@celery.task(bind=True)
+def process_vod_task(self, vod_url, num_clips):
+    """Start the pipeline for a single VOD from /api/extract-clips."""
+    task_id = self.request.id
+    try:
+        transcript_id = start_transcription(vod_url, num_clips, task_id=task_id)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        save_task(task_id, {"status": "error", "message": str(e)})
+        return None
+
+    save_task(task_id, {"status": "submitted", "transcript_id": transcript_id})
+    return transcript_id
+
+
+@celery.task
+def process_batch_vod_task(batch_id, vod_url, num_clips):
+    """
+    Start transcription for one VOD of a batch. A VOD that can't be submitted
+    is recorded as failed so the rest of the batch still goes ahead.
+    """
+    # Queued so late that the deadline already sent the batch to OpenAI
+    late_message = "Batch was submitted before this VOD started transcribing."
+    if redis_client.exists(f"clipforge:batch:{batch_id}:submitted"):
+        add_batch_failure(batch_id, vod_url, late_message)
+        return
+
+    try:
+        transcript_id = start_transcription(vod_url, num_clips, batch_id=batch_id)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        add_batch_failure(batch_id, vod_url, str(e))
+        mark_batch_vod_done(batch_id, f"failed:{uuid.uuid4().hex}")
+        return
+
+    # The batch may have been submitted while this VOD was being started
+    if redis_client.exists(f"clipforge:batch:{batch_id}:submitted"):
+        job = load_job(transcript_id)
+        if job and job["status"] == "pending":
+            job.update({"status": "error", "message": late_message})
+            save_job(transcript_id, job)
+
+
+# Acknowledged only once it has run, so a worker dying mid-task requeues it
+# instead of leaving the job pending forever (the webhook won't fire twice)
+@celery.task(acks_late=True, reject_on_worker_lost=True)
+def identify_clips_task(transcript_id):
+    """
+    Steps 3-4: fetch the finished transcript, identify clips and store the result.
+    Queued by the AssemblyAI webhook.
+    """
+    job = load_job(transcript_id)
+    if job is None or job["status"] != "pending":
+        return
+
+    try:
+        # Step 3: Fetch the finished transcription
+        transcript_text, words = fetch_finished_transcript(transcript_id)
+        print(f"[3/4] Transcription complete ({len(words)} words)")
+
+        # Step 4: Identify clips with OpenAI
+        num_clips = job["num_clips"]
+        print(f"[4/4] Identifying top {num_clips} clips with AI...")
+        clips = identify_clips(transcript_text, words, num_clips)
+        print(f"[4/4] Found {len(clips)} clips")
+
+        job.update({
+            "status": "success",
+            "transcript_text": transcript_text[:500],  # First 500 chars for preview
+            "clips": clips,
+        })
+        cache_result(job)
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        job.update({"status": "error", "message": str(e)})
+
+    save_job(transcript_id, job)
+
+
+@celery.task(bind=True, max_retries=None)
+def check_batch_deadline_task(self, batch_id):
+    """
+    Submit a batch once BATCH_TRANSCRIBE_DEADLINE has passed, even if some
+    webhooks never arrived, so one lost VOD can't hold up the rest.
+    """
+    if redis_client.exists(f"clipforge:batch:{batch_id}:submitted"):
+        return
+
+    batch = load_batch(batch_id)
+    if batch is None or time.time() >= batch["deadline"]:
+        submit_clip_batch_task.delay(batch_id)
+        return
+
+    # Re-check periodically rather than one long countdown, which the Redis
+    # broker would redeliver once its visibility timeout passes
+    raise self.retry(countdown=BATCH_POLL_INTERVAL)
+
+
+@celery.task
+def submit_clip_batch_task(batch_id):
+    """
+    Send the clip requests of every transcribed VOD in a batch to OpenAI as
+    a single batch. Queued once every VOD is done, or by the deadline check.
+    """
+    if not claim_batch_submission(batch_id):
+        return
+
+    try:
+        batch = load_batch(batch_id)
+        if batch is None:
+            raise Exception("Batch expired before it could be submitted.")
+
+        done = batch_done_members(batch_id)
+        rows = []
+
+        for transcript_id in batch_transcript_ids(batch_id):
+            job = load_job(transcript_id)
+            if job is None or job["status"] != "pending":
+                continue
+            if transcript_id not in done:
+                job.update({"status": "error", "message": "Transcription did not finish before the batch deadline."})
+                save_job(transcript_id, job)
+                continue
+            try:
+                transcript_text, words = fetch_finished_transcript(transcript_id)
+                for i, clip_request in enumerate(plan_clip_requests(words, job["num_clips"])):
+                    rows.append({"custom_id": f"{transcript_id}:{i}", "body": clip_request_body(*clip_request)})
+                job["transcript_text"] = transcript_text[:500]  # First 500 chars for preview
+            except Exception as e:
+                print(f"Error: {str(e)}")
+                job.update({"status": "error", "message": str(e)})
+            save_job(transcript_id, job)
+
+        if not rows:
+            batch.update({"status": "error", "message": "No VOD in the batch could be transcribed."})
+            save_batch(batch_id, batch)
+            return
+
+        print(f"Submitting {len(rows)} clip requests for batch {batch_id} to OpenAI")
+        batch["openai_batch_id"] = create_clip_batch(rows)
+        save_batch(batch_id, batch)
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        fail_batch(batch_id, f"Could not submit the OpenAI batch: {str(e)}")
+        return
+
+    poll_clip_batch_task.apply_async((batch_id,), countdown=BATCH_POLL_INTERVAL)
+
+
+@celery.task(bind=True, max_retries=None)
+def poll_clip_batch_task(self, batch_id):
+    """Wait for the OpenAI batch to finish, then store clips on every job."""
+    try:
+        batch = load_batch(batch_id)
+        if batch is None:
+            raise Exception("Batch expired while waiting for OpenAI.")
+        openai_batch = get_clip_batch(batch["openai_batch_id"])
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        fail_batch(batch_id, f"Could not check the OpenAI batch: {str(e)}")
+        return
+
+    if openai_batch["status"] in ("validating", "in_progress", "finalizing", "cancelling"):
+        raise self.retry(countdown=BATCH_POLL_INTERVAL)
+
+    try:
+        # Collect candidates per transcript; custom_id is "<transcript_id>:<window>".
+        # Expired or cancelled batches can still carry partial output, so read
+        # the output file whenever there is one.
+        candidates = {}
+        if openai_batch.get("output_file_id"):
+            for row in download_batch_output(openai_batch["output_file_id"]):
+                response = row.get("response") or {}
+                if response.get("status_code") != 200:
+                    continue
+                try:
+                    transcript_id = row["custom_id"].rsplit(":", 1)[0]
+                    content = response["body"]["choices"][0]["message"]["content"]
+                    clips = parse_llm_json(content)["clips"]
+                except Exception as e:
+                    # Refusals (null content) or replies cut off at max_tokens
+                    print(f"Skipping batch row {row.get('custom_id')}: {str(e)}")
+                    continue
+                candidates.setdefault(transcript_id, []).extend(clips)
+
+        for transcript_id in batch_transcript_ids(batch_id):
+            job = load_job(transcript_id)
+            if job is None or job["status"] != "pending":
+                continue
+            if transcript_id in candidates:
+                job.update({"status": "success", "clips": merge_clips(candidates[transcript_id], job["num_clips"])})
+                cache_result(job)
+            else:
+                job.update({"status": "error", "message": f"OpenAI batch {openai_batch['status']} without clips for this VOD"})
+            save_job(transcript_id, job)
+
+        print(f"Batch {batch_id} finished with OpenAI status: {openai_batch['status']}")
+        batch["status"] = "success" if openai_batch["status"] == "completed" else "error"
+        save_batch(batch_id, batch)
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        fail_batch(batch_id, f"Could not read the OpenAI batch results: {str(e)}")
+
+
+# =============================================
+# API ROUTES
+# =============================================
+
+@app.route("/", methods=["GET"])
+@app.route("/health", methods=["GET"])
+def health():
+    return jsonify({"status": "ok", "service": "ClipForge Backend"})
+
+
+@app.route("/api/extract-clips", methods=["POST"])
+def extract_clips():
+    """
+    Main endpoint: Takes a VOD URL and queues clip extraction.
+    Returns a task ID immediately; poll /api/task/<task_id> for the clips.
+    
+    Request body:
+    {
+        "vod_url": "https://www.twitch.tv/videos/...",
+        "num_clips": 5,  (optional, default 5)
+        "force_refresh": false  (optional, skip the result cache)
+    }
+    
+    If this VOD was already processed with the same num_clips, the finished
+    result is returned straight away (200) from the cache.
+    
+    Response (202):
+    {
+        "status": "pending",
+        "vod_url": "...",
+        "task_id": "..."
+    }
+    """
+    try:
+        data = request.json
+        vod_url = data.get("vod_url")
+        num_clips = parse_num_clips(data.get("num_clips", 5))
+        force_refresh = parse_flag(data.get("force_refresh"))
+
+        if not vod_url:
+            return jsonify({"status": "error", "message": "vod_url is required"}), 400
+
+        if num_clips is None:
+            return jsonify({"status": "error", "message": f"num_clips must be a whole number from 1 to {MAX_NUM_CLIPS}"}), 400
+
+        if force_refresh is None:
+            return jsonify({"status": "error", "message": "force_refresh must be true or false"}), 400
+
+        if not force_refresh:
+            cached = load_cached_result(vod_url, num_clips)
+            if cached:
+                print(f"Cache hit for: {vod_url}")
+                return jsonify(cached)
+
+        if not PUBLIC_URL or not WEBHOOK_SECRET:
+            return jsonify({
+                "status": "error",
+                "message": "PUBLIC_URL and ASSEMBLYAI_WEBHOOK_SECRET must be configured"
+            }), 500
+
+        # Record the task before queueing it so /api/task knows the ID straight away
+        task_id = uuid.uuid4().hex
+        save_task(task_id, {"status": "pending", "created_at": time.time()})
+        process_vod_task.apply_async((vod_url, num_clips), task_id=task_id)
+        print(f"Queued {vod_url} as task {task_id}")
+
+        return jsonify({
+            "status": "pending",
+            "vod_url": vod_url,
+            "task_id": task_id,
+        }), 202
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.route("/api/extract-clips-batch", methods=["POST"])
+def extract_clips_batch():
+    """
+    Batch endpoint: like /api/extract-clips for many VODs at once, for
+    non-urgent workloads. Clip detection goes through the OpenAI Batch API
+    (50% cheaper, finishes within 24h) once every VOD is transcribed.
+    
+    Request body:
+    {
+        "vods": ["https://www.twitch.tv/videos/...", ...],
+        "num_clips": 5  (optional, default 5, applies to every VOD)
+    }
+    
+    Response (202):
+    {
+        "status": "pending",
+        "batch_id": "..."
+    }
+    """
+    try:
+        data = request.json
+        vods = data.get("vods")
+        num_clips = parse_num_clips(data.get("num_clips", 5))
+
+        if not vods or not isinstance(vods, list) or not all(isinstance(vod, str) and vod for vod in vods):
+            return jsonify({"status": "error", "message": "vods must be a non-empty list of VOD URLs"}), 400
+
+        if len(vods) > MAX_BATCH_VODS:
+            return jsonify({"status": "error", "message": f"vods can hold at most {MAX_BATCH_VODS} VOD URLs"}), 400
+
+        if num_clips is None:
+            return jsonify({"status": "error", "message": f"num_clips must be a whole number from 1 to {MAX_NUM_CLIPS}"}), 400
+
+        if not PUBLIC_URL or not WEBHOOK_SECRET:
+            return jsonify({
+                "status": "error",
+                "message": "PUBLIC_URL and ASSEMBLYAI_WEBHOOK_SECRET must be configured"
+            }), 500
+
+        batch_id = uuid.uuid4().hex
+        save_batch(batch_id, {
+            "status": "pending",
+            "batch_id": batch_id,
+            "vods": vods,
+            "num_clips": num_clips,
+            "openai_batch_id": None,
+            "deadline": time.time() + BATCH_TRANSCRIBE_DEADLINE,
+        })
+        for vod_url in vods:
+            process_batch_vod_task.delay(batch_id, vod_url, num_clips)
+        check_batch_deadline_task.apply_async((batch_id,), countdown=BATCH_POLL_INTERVAL)
+        print(f"Queued batch {batch_id} with {len(vods)} VODs")
+
+        return jsonify({"status": "pending", "batch_id": batch_id}), 202
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.route("/api/batch/<batch_id>", methods=["GET"])
+def get_batch(batch_id):
+    """
+    Poll endpoint for /api/extract-clips-batch.
+    Returns the batch "status" plus one job per transcribed VOD and any VODs
+    that failed before transcription.
+    """
+    batch = load_batch(batch_id)
+    if batch is None:
+        return jsonify({"status": "error", "message": "unknown batch_id"}), 404
+
+    jobs = [load_job(transcript_id) for transcript_id in batch_transcript_ids(batch_id)]
+    batch["jobs"] = [job for job in jobs if job]
+    batch["failed"] = batch_failures(batch_id)
+    return jsonify(batch)
+
+
+@app.route("/api/assemblyai-callback", methods=["POST"])
+def assemblyai_callback():
+    """
+    AssemblyAI webhook: fired once a transcript is completed or has failed.
+    Queues steps 3-4 of the pipeline on a background worker.
+    """
+    received_secret = request.headers.get(WEBHOOK_AUTH_HEADER, "")
+    if not WEBHOOK_SECRET or not hmac.compare_digest(received_secret.encode(), WEBHOOK_SECRET.encode()):
+        return jsonify({"status": "error", "message": "unauthorized"}), 401
+
+    data = request.json or {}
+    transcript_id = data.get("transcript_id")
+    job = load_job(transcript_id) if transcript_id else None
+
+    # The webhook can beat the submitting task to saving the job; rebuild it
+    # from the record saved before submission
+    if job is None and transcript_id:
+        submission = load_submission(request.args.get("job_id", ""))
+        if submission:
+            if submission.get("batch_id"):
+                add_batch_transcript(submission["batch_id"], transcript_id)
+            create_job(transcript_id, {**submission, "transcript_id": transcript_id})
+            job = load_job(transcript_id)
+
+    if job is None:
+        # Retryable: AssemblyAI redelivers on 5xx, by which time the job may exist
+        return jsonify({"status": "error", "message": "unknown transcript_id"}), 503
+
+    # AssemblyAI may retry a delivery; only queue each job once
+    if job["status"] != "pending" or not claim_job_callback(transcript_id):
+        return jsonify({"status": "ok"})
+
+    print(f"[3/4] Transcript {transcript_id} finished with status: {data.get('status')}")
+
+    try:
+        # Batch jobs wait for the rest of their batch and go through the Batch API
+        if job.get("batch_id"):
+            mark_batch_vod_done(job["batch_id"], transcript_id)
+        else:
+            identify_clips_task.delay(transcript_id)
+    except Exception as e:
+        # Nothing was queued; release the claim so AssemblyAI's redelivery can retry
+        print(f"Error: {str(e)}")
+        release_job_callback(transcript_id)
+        return jsonify({"status": "error", "message": "could not queue clip detection"}), 503
+
+    return jsonify({"status": "ok"})
+
+
+@app.route("/api/task/<task_id>", methods=["GET"])
+def get_task(task_id):
+    """
+    Poll endpoint for /api/extract-clips.
+    Returns "status" of "pending", "success" (with clips) or "error".
+    """
+    task = load_task(task_id)
+
+    if task is None:
+        return jsonify({"status": "error", "message": "unknown task_id"}), 404
+    if task["status"] == "error":
+        return jsonify({"status": "error", "task_id": task_id, "message": task["message"]})
+    if task["status"] == "pending":
+        if is_stale(task):
+            task = {"status": "error", "message": "The task was never picked up by a worker; please retry."}
+            save_task(task_id, task)
+            return jsonify({"status": "error", "task_id": task_id, "message": task["message"]})
+        return jsonify({"status": "pending", "task_id": task_id})
+
+    # The task finished submitting; the job tracks the rest of the pipeline
+    job = load_job(task["transcript_id"])
+    if job is None:
+        return jsonify({"status": "error", "task_id": task_id, "message": "job expired"}), 404
+    return jsonify(expire_stale_job(task["transcript_id"], job))
+
+
+@app.route("/api/clips/<transcript_id>", methods=["GET"])
+def get_clips(transcript_id):
+    """
+    Look up a clip extraction job by its AssemblyAI transcript ID.
+    Returns the job with "status" of "pending", "success" (with clips) or "error".
+    """
+    job = load_job(transcript_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "unknown transcript_id"}), 404
+    return jsonify(expire_stale_job(transcript_id, job))
+
+
+@app.route("/api/transcribe", methods=["POST"])
+def transcribe_only():
+    """
+    Step-by-step endpoint: Just transcribe a VOD.
+    Use this if you want to handle clip detection separately in Bubble.
+    """
+    try:
+        data = request.json
+        vod_url = data.get("vod_url")
+
+        if not vod_url:
+            return jsonify({"status": "error", "message": "vod_url is required"}), 400
+
+        # Extract audio
+        audio_url = extract_audio_url(vod_url)
+
+        # Submit transcription
+        transcript_id = submit_transcription(audio_url)
+
+        # Poll for result
+        transcript_data = poll_transcription(transcript_id)
+
+        return jsonify({
+            "status": "success",
+            "transcript_id": transcript_id,
+            "text": transcript_data.get("text", ""),
+            "words": transcript_data.get("words", []),
+        })
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.route("/api/get-audio-url", methods=["POST"])
+def get_audio_url():
+    """
+    Utility endpoint: Just extract the direct audio URL from a VOD link.
+    """
+    try:
+        data = request.json
+        vod_url = data.get("vod_url")
+
+        if not vod_url:
+            return jsonify({"status": "error", "message": "vod_url is required"}), 400
+
+        audio_url = extract_audio_url(vod_url)
+
+        return jsonify({
+            "status": "success",
+            "vod_url": vod_url,
+            "audio_url": audio_url,
+        })
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+if __name__ == "__main__":
+    # Local development only. Production runs under gunicorn with gevent
+    # workers (see Procfile), which monkey-patch sockets, sleeps and
+    # subprocesses so I/O waits don't tie up a worker.
+    port = int(os.environ.get("PORT", 5000))
+    app.run(host="0.0.0.0", port=port, debug=False)
@@ -0,0 +1,184 @@
+"""
+Offline tests for the ClipForge API: Redis, yt-dlp, AssemblyAI and OpenAI
+are all replaced by in-memory fakes, and Celery tasks run inline.
+Run with: python -m pytest
+"""
+
+import pytest
+
+import app as backend
+
+SECRET = "test-secret"
+VOD_URL = "https://www.twitch.tv/videos/123456789"
+WORDS = [{"text": f"word{i}", "start": i * 1000, "end": i * 1000 + 900} for i in range(60)]
+CLIP = {"title": "1v4 Clutch", "start_ms": 5000, "end_ms": 25000, "virality_score": 9, "reason": "Big play"}
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the subset of redis.Redis the app uses. TTLs are ignored."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    def setex(self, key, ttl, value):
+        self.data[key] = str(value)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(members)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def scard(self, key):
+        return len(self.data.get(key, set()))
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(values)
+
+    def lrange(self, key, start, end):
+        values = self.data.get(key, [])
+        return values[start:] if end == -1 else values[start:end + 1]
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+    def expire(self, key, ttl):
+        return key in self.data
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    redis_client = FakeRedis()
+    monkeypatch.setattr(backend, "redis_client", redis_client)
+    return redis_client
+
+
+@pytest.fixture
+def client(fake_redis, monkeypatch):
+    monkeypatch.setattr(backend, "PUBLIC_URL", "https://clipforge.test")
+    monkeypatch.setattr(backend, "WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(backend, "extract_audio_url", lambda vod_url: "https://cdn.test/audio.m4a")
+    monkeypatch.setattr(backend, "submit_transcription", lambda audio_url, webhook_url=None: "tr-1")
+    monkeypatch.setattr(
+        backend, "get_transcript",
+        lambda transcript_id, etag=None: ({"status": "completed", "text": "hello there", "words": WORDS}, None),
+    )
+    monkeypatch.setattr(backend, "request_clip_candidates", lambda sections, num_clips: [CLIP])
+
+    backend.celery.conf.task_always_eager = True
+    yield backend.app.test_client()
+    backend.celery.conf.task_always_eager = False
+
+
+def webhook(client, transcript_id="tr-1", secret=SECRET):
+    return client.post(
+        "/api/assemblyai-callback",
+        json={"transcript_id": transcript_id, "status": "completed"},
+        headers={backend.WEBHOOK_AUTH_HEADER: secret},
+    )
+
+
+def test_extract_clips_then_webhook_completes_task(client):
+    response = client.post("/api/extract-clips", json={"vod_url": VOD_URL, "num_clips": 1})
+    assert response.status_code == 202
+    task_id = response.get_json()["task_id"]
+
+    # Submitted to AssemblyAI, waiting for the webhook
+    assert client.get(f"/api/task/{task_id}").get_json()["status"] == "pending"
+
+    assert webhook(client).status_code == 200
+
+    result = client.get(f"/api/task/{task_id}").get_json()
+    assert result["status"] == "success"
+    assert result["clips"] == [CLIP]
+
+
+def test_cache_hit_and_force_refresh(client):
+    backend.cache_result({"status": "success", "vod_url": VOD_URL, "num_clips": 5, "clips": [CLIP]})
+
+    response = client.post("/api/extract-clips", json={"vod_url": VOD_URL})
+    assert response.status_code == 200
+    assert response.get_json()["clips"] == [CLIP]
+
+    response = client.post("/api/extract-clips", json={"vod_url": VOD_URL, "force_refresh": "true"})
+    assert response.status_code == 202
+
+
+@pytest.mark.parametrize("body", [
+    {"vod_url": VOD_URL, "num_clips": True},
+    {"vod_url": VOD_URL, "num_clips": 2.5},
+    {"vod_url": VOD_URL, "num_clips": backend.MAX_NUM_CLIPS + 1},
+    {"vod_url": VOD_URL, "force_refresh": "yes"},
+])
+def test_extract_clips_rejects_bad_params(client, body):
+    assert client.post("/api/extract-clips", json=body).status_code == 400
+
+
+def test_webhook_rejects_bad_secret(client):
+    assert webhook(client, secret="wrong").status_code == 401
+
+
+def test_webhook_unknown_job_is_retryable(client):
+    assert webhook(client, transcript_id="tr-unknown").status_code == 503
+
+
+def test_duplicate_webhook_queues_once(client, monkeypatch):
+    queued = []
+    monkeypatch.setattr(backend.identify_clips_task, "delay", queued.append)
+    client.post("/api/extract-clips", json={"vod_url": VOD_URL})
+
+    assert webhook(client).status_code == 200
+    assert webhook(client).status_code == 200
+    assert queued == ["tr-1"]
+
+
+def test_webhook_releases_claim_when_queueing_fails(client, fake_redis, monkeypatch):
+    def broker_down(transcript_id):
+        raise ConnectionError("broker unavailable")
+
+    client.post("/api/extract-clips", json={"vod_url": VOD_URL})
+    monkeypatch.setattr(backend.identify_clips_task, "delay", broker_down)
+    assert webhook(client).status_code == 503
+    assert not fake_redis.exists("clipforge:job:tr-1:claimed")
+
+    # AssemblyAI's redelivery goes through once the broker is back
+    queued = []
+    monkeypatch.setattr(backend.identify_clips_task, "delay", queued.append)
+    assert webhook(client).status_code == 200
+    assert queued == ["tr-1"]
+
+
+def test_merge_clips_drops_overlaps():
+    clips = [
+        {"start_ms": 0, "end_ms": 30000, "virality_score": 6},
+        {"start_ms": 20000, "end_ms": 50000, "virality_score": 9},
+        {"start_ms": 60000, "end_ms": 80000, "virality_score": 7},
+    ]
+    merged = backend.merge_clips(clips, 3)
+    assert [clip["virality_score"] for clip in merged] == [9, 7]
+
+
+def test_stale_pending_task_reports_error(client, monkeypatch):
+    response = client.post("/api/extract-clips", json={"vod_url": VOD_URL})
+    task_id = response.get_json()["task_id"]
+
+    # The webhook never arrives
+    now = backend.time.time()
+    monkeypatch.setattr(backend.time, "time", lambda: now + backend.JOB_STALE_AFTER + 1)
+    assert client.get(f"/api/task/{task_id}").get_json()["status"] == "error"